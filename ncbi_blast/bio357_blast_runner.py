@@ -1,87 +1,697 @@
-from Bio.Blast import NCBIWWW
-from Bio.Blast import NCBIXML
-from Bio import SeqIO
+from Bio.SeqIO.FastaIO import SimpleFastaParser
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import base64
+import hashlib
+import gzip
+import http.client
 import json
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import urllib.parse
+import urllib.request
+
+# lxml parses several times faster than the standard library and can skip
+# uninteresting elements in C; fall back to ElementTree if it isn't installed.
+try:
+    from lxml import etree
+    HAVE_LXML = True
+except ImportError:
+    import xml.etree.ElementTree as etree
+    HAVE_LXML = False
+
+# orjson's C encoder is several times faster than json for compact output.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+BLAST_URL = "https://blast.ncbi.nlm.nih.gov/Blast.cgi"
+EFETCH_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/efetch.fcgi"
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "bio357_blast")
+
+_RID_RE = re.compile(r"^\s*RID = (\S+)", re.MULTILINE)
+_STATUS_RE = re.compile(r"Status=(\w+)")
+
+
+# One keep-alive connection per thread (run_blast_batch() searches in parallel)
+_connections = threading.local()
+
+
+def _blast_connection():
+    """
+    Returns this thread's persistent HTTPS connection to the BLAST server.
+
+    Reusing the connection saves a TCP and TLS handshake on every status check.
+    An HTTPS proxy from the environment (HTTPS_PROXY) is honoured via CONNECT,
+    including any user:password credentials in the proxy URL.
+    """
+    connection = getattr(_connections, "blast", None)
+    if connection is None:
+        host = urllib.parse.urlsplit(BLAST_URL).hostname
+        proxy = urllib.request.getproxies().get("https")
+        if proxy and not urllib.request.proxy_bypass(host):
+            proxy_url = urllib.parse.urlsplit(proxy if "://" in proxy else f"http://{proxy}")
+            # Without a port, use the proxy scheme's default port, as urllib does
+            proxy_port = proxy_url.port or (443 if proxy_url.scheme == "https" else 80)
+            connection = http.client.HTTPSConnection(proxy_url.hostname, proxy_port, timeout=120)
+            tunnel_headers = {}
+            if proxy_url.username:
+                credentials = (f"{urllib.parse.unquote(proxy_url.username)}:"
+                               f"{urllib.parse.unquote(proxy_url.password or '')}")
+                tunnel_headers["Proxy-Authorization"] = "Basic " + base64.b64encode(credentials.encode()).decode("ascii")
+            connection.set_tunnel(host, headers=tunnel_headers)
+        else:
+            connection = http.client.HTTPSConnection(host, timeout=120)
+        _connections.blast = connection
+    return connection
+
+
+def _blast_request(params, post=False, stream=False):
+    """
+    Sends a request to the NCBI BLAST URL API and returns the response body.
+
+    Responses are requested gzip-compressed; BLAST XML shrinks roughly 8-10x,
+    and is decompressed transparently. If the server has closed the idle
+    keep-alive connection, the request is retried once on a fresh connection.
+
+    Args:
+        params (dict): Query parameters for Blast.cgi.
+        post (bool): Send the parameters as a POST body instead of a GET query string.
+        stream (bool): Return a readable file-like object that decompresses as it is
+            read, instead of the whole body as bytes. The connection is not reused
+            afterwards, since the caller may stop reading before the end.
+    """
+    data = urllib.parse.urlencode(params)
+    path = urllib.parse.urlsplit(BLAST_URL).path
+    headers = {"Accept-Encoding": "gzip"}
+    if post:
+        headers["Content-Type"] = "application/x-www-form-urlencoded"
+    if stream:
+        headers["Connection"] = "close"
+    for attempt in range(2):
+        connection = _blast_connection()
+        try:
+            if post:
+                connection.request("POST", path, body=data, headers=headers)
+            else:
+                connection.request("GET", f"{path}?{data}", headers=headers)
+            response = connection.getresponse()
+            if stream and response.status < 400:
+                break
+            body = response.read()
+            break
+        except (http.client.HTTPException, OSError):
+            connection.close()
+            _connections.blast = None
+            if attempt == 1:
+                raise
+    if response.status >= 400:
+        raise RuntimeError(f"NCBI BLAST server returned HTTP {response.status} {response.reason}.")
+    gzipped = response.getheader("Content-Encoding", "").lower() == "gzip"
+    if stream:
+        return gzip.GzipFile(fileobj=response) if gzipped else response
+    return gzip.decompress(body) if gzipped else body
+
+
+def _submit_blast(program, database, query, **options):
+    """
+    Submits a BLAST search with CMD=Put and returns its request ID (RID).
+
+    Args:
+        program (str): The BLAST program to use.
+        database (str): The NCBI database to search against.
+        query (str): The query sequence, multi-sequence FASTA text, or accession ID.
+        **options: Additional Blast.cgi parameters (e.g. hitlist_size=10). Options set to None are not sent.
+    """
+    params = {
+        "CMD": "Put",
+        "PROGRAM": program,
+        "DATABASE": database,
+        "QUERY": query
+    }
+    params.update((key.upper(), value) for key, value in options.items() if value is not None)
+    page = _blast_request(params, post=True).decode("utf-8", "replace")
+    match = _RID_RE.search(page)
+    if match is None:
+        raise RuntimeError("NCBI BLAST did not return a request ID for the search.")
+    return match.group(1)
+
+
+def _wait_for_blast(rid, max_polls=60):
+    """
+    Polls a submitted BLAST search and returns its XML results.
+
+    The wait between status checks doubles from 5 s up to a 60 s cap, so short
+    searches are picked up quickly without hammering the server on long ones.
+
+    Args:
+        rid (str): The request ID returned by _submit_blast().
+        max_polls (int): Number of status checks before giving up (default: 60).
+
+    Returns:
+        A binary file-like object streaming the BLAST XML output.
+    """
+    for i in range(max_polls):
+        page = _blast_request({"CMD": "Get", "FORMAT_OBJECT": "SearchInfo", "RID": rid})
+        match = _STATUS_RE.search(page.decode("utf-8", "replace"))
+        status = match.group(1) if match else "UNKNOWN"
+        if status == "READY":
+            return _blast_request({"CMD": "Get", "FORMAT_TYPE": "XML", "RID": rid}, stream=True)
+        if status != "WAITING":
+            raise RuntimeError(f"BLAST search {rid} ended with status {status}.")
+        time.sleep(min(5 * 2 ** i, 60))
+    raise RuntimeError(f"BLAST search {rid} did not finish after {max_polls} status checks.")
+
+
+def _efetch_fasta(accession, db):
+    """
+    Downloads the FASTA sequence for an accession ID with NCBI EFetch.
+
+    Args:
+        accession (str): The NCBI accession ID.
+        db (str): The Entrez database holding the sequence ("nuccore" or "protein").
+    """
+    params = urllib.parse.urlencode({"db": db, "id": accession, "rettype": "fasta", "retmode": "text"})
+    with urllib.request.urlopen(f"{EFETCH_URL}?{params}") as response:
+        return response.read()
+
+
+def _run_local_blast(accession, local_db, program, output_file, hitlist_size, expect, word_size, compact):
+    """
+    Fetches an accession's sequence and searches it against a local BLAST+ database.
+
+    This skips NCBI's BLAST queue entirely. BLAST+ writes XML (-outfmt 5) to
+    stdout, which is streamed straight into the same JSON transcoder used for
+    remote searches, so the output file has the same layout.
+
+    Args:
+        accession (str): The NCBI accession ID to search with.
+        local_db (str): Path/name of the local BLAST database (as given to -db).
+        program (str): The BLAST+ program to run, e.g. "blastn".
+        output_file (str): The name of the JSON file to write.
+        hitlist_size (int): Maximum number of hits per query.
+        expect (float): E-value cutoff.
+        word_size (int): Word size for initial matches, or None for the program's default.
+        compact (bool): Write compact JSON instead of indented JSON.
+    """
+    db = "protein" if program in ("blastp", "tblastn") else "nuccore"
+    fasta = _efetch_fasta(accession, db)
+    if not fasta.lstrip().startswith(b">"):
+        raise ValueError(f"Could not fetch a sequence for accession ID '{accession}'.")
+
+    # delete=False so BLAST+ can open the file on Windows while it exists
+    with tempfile.NamedTemporaryFile(suffix=".fasta", delete=False) as tmp:
+        tmp.write(fasta)
+    command = [program, "-db", local_db, "-query", tmp.name, "-outfmt", "5"]
+    if hitlist_size is not None:
+        command += ["-max_target_seqs", str(hitlist_size)]
+    if expect is not None:
+        command += ["-evalue", str(expect)]
+    if word_size is not None:
+        command += ["-word_size", str(word_size)]
+
+    try:
+        print(f"Running local {program} against '{local_db}'...")
+        # stderr goes to a file rather than a pipe, so a flood of BLAST+ warnings
+        # can never fill the pipe buffer and stall the process
+        with tempfile.TemporaryFile() as error_file:
+            try:
+                process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=error_file)
+            except FileNotFoundError:
+                raise RuntimeError(f"'{program}' was not found. Install NCBI BLAST+ to search a local database.")
+            transcode_error = None
+            try:
+                with process.stdout:
+                    _write_json_file(process.stdout, output_file, compact)
+            except Exception as e:
+                transcode_error = e
+            finally:
+                returncode = process.wait()
+
+            # BLAST+'s own error message explains a failure better than the
+            # parse error from its empty or partial output
+            if returncode != 0:
+                error_file.seek(0)
+                error_output = error_file.read().decode("utf-8", "replace").strip()
+                raise RuntimeError(f"{program} failed (exit code {returncode}): {error_output or transcode_error}")
+            if transcode_error is not None:
+                raise transcode_error
+    finally:
+        os.remove(tmp.name)
+
+
+def _cache_path(program, database, query, options):
+    """
+    Returns the cache file for a search's raw BLAST XML.
+
+    The file name is a hash of everything sent with the Put request, so changing
+    any search parameter gives a different cache entry.
+
+    Args:
+        program (str): The BLAST program.
+        database (str): The NCBI database.
+        query (str): The query text.
+        options (dict): The additional Blast.cgi parameters for the search.
+    """
+    settings = json.dumps(sorted(options.items()))
+    key = hashlib.blake2b(f"{program}|{database}|{query}|{settings}".encode(), digest_size=16).hexdigest()
+    return os.path.join(CACHE_DIR, f"{key}.xml")
+
+
+def _save_to_cache(result_handle, cache_path):
+    """
+    Copies BLAST XML results into a temporary file next to their cache entry.
+
+    Returns the temporary file's path. The caller renames it to cache_path only
+    once the XML has been transcoded successfully, so an interrupted run or an
+    error page from the server never becomes a cache entry. If copying fails,
+    the temporary file is removed.
+    """
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    temp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(temp_path, "wb") as f:
+            shutil.copyfileobj(result_handle, f)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return temp_path
+
+
+def _int(text):
+    """Converts an optional XML text value to int."""
+    return int(text) if text is not None else None
+
+
+def _float(text):
+    """Converts an optional XML text value to float."""
+    return float(text) if text is not None else None
+
+
+def _str(text):
+    """Converts an optional XML text value to str."""
+    return text if text is not None else ""
+
+
+def _count(text):
+    """Converts an optional XML count to int, matching Biopython's (None, None) default."""
+    return int(text) if text is not None else (None, None)
+
+
+# (JSON key, BLAST XML tag, converter) for each HSP field, in output order.
+# "frame" and "strand" hold the raw query and hit frames until
+# _set_frame_and_strand() combines them.
+HSP_FIELDS = (
+    ("align_length", "Hsp_align-len", _int),
+    ("bits", "Hsp_bit-score", _float),
+    ("expect", "Hsp_evalue", _float),
+    ("frame", "Hsp_query-frame", _int),
+    ("gaps", "Hsp_gaps", _count),
+    ("identities", "Hsp_identity", _count),
+    ("positives", "Hsp_positive", _int),
+    ("query", "Hsp_qseq", _str),
+    ("query_end", "Hsp_query-to", _int),
+    ("query_start", "Hsp_query-from", _int),
+    ("sbjct", "Hsp_hseq", _str),
+    ("sbjct_end", "Hsp_hit-to", _int),
+    ("sbjct_start", "Hsp_hit-from", _int),
+    ("score", "Hsp_score", _float),
+    ("strand", "Hsp_hit-frame", _int),
+)
+
+# Precompiled views of HSP_FIELDS for the per-<Hsp> loop: the value each key
+# takes when its tag is missing, and a tag -> (key, converter) lookup so the
+# children of an <Hsp> are visited once instead of searched for per field.
+_HSP_DEFAULTS = {key: convert(None) for key, _, convert in HSP_FIELDS}
+_HSP_TAG_FIELDS = {xml_tag: (key, convert) for key, xml_tag, convert in HSP_FIELDS}
+
+
+# The only elements _transcode_blast_xml() reacts to. lxml filters on these
+# while parsing, so the ~17 child elements of every <Hsp> never reach Python.
+_TRANSCODE_TAGS = (
+    "Hsp", "Hit_id", "Hit_def", "Hit_len", "Hit",
+    "Iteration_query-ID", "Iteration_query-def", "Iteration",
+    "BlastOutput_program", "BlastOutput_query-ID", "BlastOutput_query-def",
+)
+
+
+def _iterparse(result_handle):
+    """Returns an iterparse iterator of "end" events for _TRANSCODE_TAGS (and more without lxml)."""
+    if HAVE_LXML:
+        return etree.iterparse(result_handle, events=("end",), tag=_TRANSCODE_TAGS)
+    return etree.iterparse(result_handle, events=("end",))
+
+
+def _discard(elem):
+    """
+    Frees a fully processed element.
+
+    With lxml, already-processed preceding siblings are also removed from
+    the tree, so the partially built document stays bounded in size.
+    """
+    elem.clear()
+    if HAVE_LXML:
+        while elem.getprevious() is not None:
+            del elem.getparent()[0]
+
+
+def _set_frame_and_strand(hsp_dict, application):
+    """
+    Replaces the raw frames in hsp_dict with Biopython-style frame and strand tuples.
+
+    Args:
+        hsp_dict (dict): HSP fields built from HSP_FIELDS.
+        application (str): The upper-cased BLAST program, e.g. "BLASTN".
+    """
+    query_frame = hsp_dict["frame"]
+    hit_frame = hsp_dict["strand"]
+    frame = ()
+    strand = (None, None)
+    if query_frame is not None:
+        frame = (query_frame,)
+        if application == "BLASTN":
+            strand = ("Plus" if query_frame > 0 else "Minus",)
+    if hit_frame is not None:
+        frame = frame + (hit_frame,) if frame else (0, hit_frame)
+        if application == "BLASTN":
+            strand += ("Plus" if hit_frame > 0 else "Minus",)
+    hsp_dict["frame"] = frame
+    hsp_dict["strand"] = strand
+
+
+class _BlastJsonWriter:
+    """
+    Writes BLAST results as a JSON array, one HSP at a time.
+
+    With compact=False the text produced is identical to
+    json.dump(records, f, indent=4) for the equivalent nested list of
+    record/alignment/HSP dicts. With compact=True it is the equivalent JSON
+    without any whitespace; when orjson is installed, some floats are
+    spelled differently than json spells them (2e-7 rather than 2e-07).
+    """
+
+    def __init__(self, f, compact=True):
+        self.f = f
+        self.compact = compact
+        self.colon = ":" if compact else ": "
+        self.records = 0
+        self.alignments = 0
+        self.hsps = 0
+        self.in_record = False
+        self.in_alignment = False
+
+    def _newline(self, level):
+        return "" if self.compact else "\n" + "    " * level
+
+    def _open_item(self, count, level):
+        self.f.write(("," if count else "") + self._newline(level))
+
+    def _close_list(self, count, level):
+        self.f.write(self._newline(level) + "]" if count else "]")
+
+    def _field(self, key, value, level):
+        return f'{self._newline(level)}"{key}"{self.colon}{json.dumps(value)},'
+
+    def _dumps_hsp(self, hsp_dict):
+        if not self.compact:
+            return json.dumps(hsp_dict, indent=4).replace("\n", self._newline(5))
+        if orjson is not None:
+            return orjson.dumps(hsp_dict).decode()
+        return json.dumps(hsp_dict, separators=(",", ":"))
+
+    def start(self):
+        self.f.write("[")
+
+    def start_record(self, query, query_id):
+        self._open_item(self.records, 1)
+        self.f.write("{" + self._field("query", query, 2) + self._field("query_id", query_id, 2)
+                     + f'{self._newline(2)}"alignments"{self.colon}[')
+        self.records += 1
+        self.alignments = 0
+        self.in_record = True
+
+    def start_alignment(self, title, hit_id, hit_def, length):
+        self._open_item(self.alignments, 3)
+        self.f.write("{" + self._field("title", title, 4) + self._field("hit_id", hit_id, 4)
+                     + self._field("hit_def", hit_def, 4) + self._field("length", length, 4)
+                     + f'{self._newline(4)}"hsps"{self.colon}[')
+        self.alignments += 1
+        self.hsps = 0
+        self.in_alignment = True
+
+    def write_hsp(self, hsp_dict):
+        self._open_item(self.hsps, 5)
+        self.f.write(self._dumps_hsp(hsp_dict))
+        self.hsps += 1
+
+    def end_alignment(self):
+        self._close_list(self.hsps, 4)
+        self.f.write(self._newline(3) + "}")
+        self.in_alignment = False
+
+    def end_record(self):
+        self._close_list(self.alignments, 2)
+        self.f.write(self._newline(1) + "}")
+        self.in_record = False
+
+    def end(self):
+        self._close_list(self.records, 0)
+
+
+def _transcode_blast_xml(result_handle, f, compact=True):
+    """
+    Streams BLAST XML straight into JSON text without building record objects.
+
+    Each <Hsp> is converted with HSP_FIELDS and written as soon as it closes,
+    then cleared, so memory use stays flat no matter how many hits there are.
+
+    Args:
+        result_handle: A binary file-like object containing BLAST XML output.
+        f: A text file open for writing the JSON array.
+        compact (bool): Write compact JSON instead of 4-space indented JSON (default: True).
+    """
+    writer = _BlastJsonWriter(f, compact)
+    header = {}
+    iteration = {}
+    hit = {}
+
+    def ensure_record():
+        if not writer.in_record:
+            writer.start_record(
+                iteration.get("Iteration_query-def") or header.get("BlastOutput_query-def", ""),
+                iteration.get("Iteration_query-ID") or header.get("BlastOutput_query-ID"))
+
+    def ensure_alignment():
+        ensure_record()
+        if not writer.in_alignment:
+            # Like NCBIXML, the title is "<Hit_id> <Hit_def>", without the space when there is no <Hit_id>
+            title = (hit["Hit_id"] + " " if "Hit_id" in hit else "") + hit.get("Hit_def", "")
+            writer.start_alignment(title, hit.get("Hit_id", ""), hit.get("Hit_def", ""), _int(hit.get("Hit_len")))
+
+    writer.start()
+    application = None
+    for _, elem in _iterparse(result_handle):
+        tag = elem.tag
+        if tag == "Hsp":
+            hsp_dict = dict(_HSP_DEFAULTS)
+            for child in elem:
+                field = _HSP_TAG_FIELDS.get(child.tag)
+                if field is not None:
+                    key, convert = field
+                    hsp_dict[key] = convert(child.text or "")
+            # Like Biopython, report the identities as positives when <Hsp_positive> is missing
+            if hsp_dict["positives"] is None and hsp_dict["identities"] != (None, None):
+                hsp_dict["positives"] = hsp_dict["identities"]
+            _set_frame_and_strand(hsp_dict, application)
+            ensure_alignment()
+            writer.write_hsp(hsp_dict)
+            _discard(elem)
+        elif tag in ("Hit_id", "Hit_def", "Hit_len"):
+            # An empty element is an empty string, as in NCBIXML; Hit_len stays None
+            hit[tag] = elem.text if tag == "Hit_len" else elem.text or ""
+        elif tag == "Hit":
+            ensure_alignment()
+            writer.end_alignment()
+            hit = {}
+            _discard(elem)
+        elif tag in ("Iteration_query-ID", "Iteration_query-def"):
+            iteration[tag] = elem.text or ""
+        elif tag == "Iteration":
+            ensure_record()
+            writer.end_record()
+            iteration = {}
+            _discard(elem)
+        elif tag in ("BlastOutput_query-ID", "BlastOutput_query-def"):
+            header[tag] = elem.text or ""
+        elif tag == "BlastOutput_program":
+            application = (elem.text or "").upper()
+    if application is None:
+        # Every BLAST XML report names its program; an error page does not
+        raise ValueError("The BLAST response is not BLAST XML output.")
+    writer.end()
+
+
+def _write_json_file(result_handle, output_file, compact=True):
+    """
+    Transcodes BLAST XML into output_file, replacing it only if transcoding succeeds.
+
+    The JSON is written to a temporary file next to output_file and renamed into
+    place at the end, so a failed search or a parse error never leaves a truncated
+    file in place of earlier results.
+
+    Args:
+        result_handle: A binary file-like object containing BLAST XML output.
+        output_file (str): The name of the JSON file to write.
+        compact (bool): Write compact JSON instead of 4-space indented JSON (default: True).
+    """
+    temp_path = f"{output_file}.tmp"
+    try:
+        with open(temp_path, "w") as f:
+            _transcode_blast_xml(result_handle, f, compact)
+        os.replace(temp_path, output_file)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
 
 
 def run_ncbi_blast_to_json(query, query_type="sequence", database="nr", program="blastn",
-                           output_file="blast_results.json"):
+                           output_file="blast_results.json", hitlist_size=10, expect=1e-5,
+                           word_size=None, megablast=True, compact=True, entrez_query=None,
+                           use_cache=True, local_db=None):
     """
     Runs NCBI BLAST with the given query (sequence or accession ID) and parameters,
     then writes the output as a JSON file.
 
+    A multi-sequence FASTA string is submitted as a single BLAST search, and the
+    JSON file then holds one result entry per query sequence.
+
+    The hit limit and e-value cutoff are applied by NCBI before results are
+    sent back, so tighter values mean less XML to download, parse and write.
+
+    Raw results are cached under ~/.cache/bio357_blast, so re-running the same
+    search with the same parameters skips NCBI entirely.
+
     Args:
-        query (str): The query sequence or accession ID.
+        query (str): The query sequence (or multi-sequence FASTA text) or accession ID.
         query_type (str): Specifies whether the 'query' is a 'sequence' or 'accession'. Defaults to 'sequence'.
         database (str): The NCBI database to search against (default: "nr").
         program (str): The BLAST program to use (default: "blastn").
         output_file (str): The name of the JSON file to write the results to (default: "blast_results.json").
+        hitlist_size (int): Maximum number of hits to return per query (default: 10).
+        expect (float): E-value cutoff for reported hits (default: 1e-5).
+        word_size (int): Word size for initial matches (default: None, the program's default).
+        megablast (bool): Use megablast for blastn searches, which is much faster for
+            high-identity nucleotide matches (default: True). Ignored for other programs.
+        compact (bool): Write compact JSON without indentation, which is much faster and
+            smaller for large results (default: True). Set to False for indented output.
+        entrez_query (str): Entrez query that restricts the database before searching, e.g.
+            "txid9606[ORGN]" for human sequences or "refseq_rna[Filter]" for RefSeq RNAs
+            (default: None, search the whole database).
+        use_cache (bool): Reuse cached results for an identical earlier search and cache
+            new results (default: True).
+        local_db (str): A local BLAST+ database to search instead of NCBI's servers. Only used
+            for accession queries: the sequence is downloaded with EFetch and searched locally,
+            avoiding NCBI's BLAST queue (default: None).
+
+    Returns:
+        str: The path of the JSON file written, or None if the search failed.
     """
     try:
         if query_type == "sequence":
             print(f"Running NCBI BLAST with sequence: '{query[:20]}...'")
-            result_handle = NCBIWWW.qblast(program, database, query)
         elif query_type == "accession":
             print(f"Running NCBI BLAST with accession ID: '{query}'")
-            result_handle = NCBIWWW.qblast(program, database, query)
         else:
             raise ValueError("Invalid query_type. Must be 'sequence' or 'accession'.")
 
-        print("BLAST search completed successfully.")
-
-        blast_records = NCBIXML.parse(result_handle)
-        results_list = []
-
-        for blast_record in blast_records:
-            record_dict = {
-                "query": blast_record.query,
-                "query_id": blast_record.query_id,
-                # "description": blast_record.description,
-                "alignments": []
-            }
-            for alignment in blast_record.alignments:
-                alignment_dict = {
-                    "title": alignment.title,
-                    "hit_id": alignment.hit_id,
-                    "hit_def": alignment.hit_def,
-                    # "hit_accession": alignment.hit_accession,
-                    "length": alignment.length,
-                    "hsps": []
-                }
-                for hsp in alignment.hsps:
-                    hsp_dict = {
-                        "align_length": hsp.align_length,
-                        "bits": hsp.bits,
-                        "expect": hsp.expect,
-                        "frame": hsp.frame,
-                        "gaps": hsp.gaps,
-                        "identities": hsp.identities,
-                        "positives": hsp.positives,
-                        "query": hsp.query,
-                        "query_end": hsp.query_end,
-                        "query_start": hsp.query_start,
-                        "sbjct": hsp.sbjct,
-                        "sbjct_end": hsp.sbjct_end,
-                        "sbjct_start": hsp.sbjct_start,
-                        "score": hsp.score,
-                        "strand": hsp.strand
-                    }
-                    alignment_dict["hsps"].append(hsp_dict)
-                record_dict["alignments"].append(alignment_dict)
-            results_list.append(record_dict)
-
-        with open(output_file, "w") as f:
-            json.dump(results_list, f, indent=4)
+        if local_db and query_type == "accession":
+            _run_local_blast(query, local_db, program, output_file, hitlist_size, expect, word_size, compact)
+            print(f"BLAST results written to: {output_file}")
+            return output_file
+
+        options = {
+            "hitlist_size": hitlist_size,
+            "expect": expect,
+            "word_size": word_size,
+            "entrez_query": entrez_query,
+            "megablast": "on" if megablast and program == "blastn" else None
+        }
+        cache_path = _cache_path(program, database, query, options) if use_cache else None
+
+        if cache_path and os.path.exists(cache_path):
+            print(f"Using cached BLAST results from: {cache_path}")
+            try:
+                with open(cache_path, "rb") as result_handle:
+                    _write_json_file(result_handle, output_file, compact)
+            except Exception:
+                # A cache entry that cannot be transcoded would fail the same way
+                # on every run, so drop it and let the next run search again
+                os.remove(cache_path)
+                raise
+        else:
+            rid = _submit_blast(program, database, query, **options)
+            print(f"Submitted BLAST search (RID: {rid}). Waiting for results...")
+            result_handle = _wait_for_blast(rid)
+            print("BLAST search completed successfully.")
+            if cache_path:
+                with result_handle:
+                    temp_path = _save_to_cache(result_handle, cache_path)
+                try:
+                    with open(temp_path, "rb") as cached_handle:
+                        _write_json_file(cached_handle, output_file, compact)
+                    # Only results that transcoded cleanly are cached
+                    os.replace(temp_path, cache_path)
+                finally:
+                    if os.path.exists(temp_path):
+                        os.remove(temp_path)
+            else:
+                with result_handle:
+                    _write_json_file(result_handle, output_file, compact)
 
         print(f"BLAST results written to: {output_file}")
+        return output_file
 
     except ValueError as ve:
         print(f"Error: {ve}")
     except Exception as e:
         print(f"An error occurred: {e}")
+    return None
+
+
+def run_blast_batch(jobs, max_concurrent=3):
+    """
+    Runs several independent BLAST searches at the same time.
+
+    Each search spends most of its time waiting in NCBI's queue, so keeping a
+    few in flight at once gives a near-linear speedup. NCBI asks clients not to
+    run more than a handful of concurrent searches, hence the small default pool.
+
+    Args:
+        jobs (list): A list of dicts of keyword arguments for run_ncbi_blast_to_json(),
+            each with its own 'output_file'.
+        max_concurrent (int): Maximum number of searches in flight at once (default: 3).
+
+    Returns:
+        list: The result of run_ncbi_blast_to_json() for each job, in order.
+    """
+    with ThreadPoolExecutor(max_workers=max_concurrent) as executor:
+        return list(executor.map(lambda job: run_ncbi_blast_to_json(**job), jobs))
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run an NCBI BLAST search and save the results as JSON.")
+    parser.add_argument("--no-cache", action="store_true",
+                        help=f"always run a fresh search instead of reusing cached results in {CACHE_DIR}")
+    args = parser.parse_args()
+
     print("Choose the query type:")
     print("1. Enter sequence directly")
     print("2. Provide a FASTA file")
@@ -97,9 +707,16 @@ if __name__ == "__main__":
     elif choice == "2":
         fasta_file = input("Enter the path to the FASTA file: ").strip()
         try:
-            record = next(SeqIO.parse(fasta_file, "fasta"))
-            query_sequence = str(record.seq)
+            # SimpleFastaParser yields plain (title, sequence) strings, skipping SeqRecord construction
+            with open(fasta_file) as handle:
+                entries = list(SimpleFastaParser(handle))
+            if not entries:
+                print(f"Error: No sequences found in {fasta_file}")
+                exit()
+            # Submit every record as one batched BLAST search
+            query_sequence = "\n".join(f">{title}\n{sequence}" for title, sequence in entries)
             query_type = "sequence"
+            print(f"Read {len(entries)} sequence(s) from {fasta_file}")
         except FileNotFoundError:
             print(f"Error: File not found at {fasta_file}")
             exit()
@@ -115,12 +732,52 @@ if __name__ == "__main__":
         exit()
 
     if query_sequence:
-        # Specify the database and program (optional)
-        database_name = "nr"
+        # Optionally restrict the search to part of the database (e.g. txid9606[ORGN] for human)
+        entrez_query = input("Enter an Entrez query to limit the search (optional, press Enter to skip): ").strip() or None
+
+        # Specify the database(s) and program (optional).
+        # Listing several databases runs one BLAST search per database concurrently.
+        database_names = ["nr"]
         blast_program = "blastn"
 
-        # Specify the output JSON file name (optional)
+        # Limit what NCBI sends back (optional)
+        hitlist_size = 10
+        expect_threshold = 1e-5
+        word_size = None
+        use_megablast = True
+
+        # Path to a local BLAST+ database (optional). When set, accession ID queries
+        # are searched locally instead of waiting in NCBI's queue.
+        local_database = None
+
+        # Specify the output JSON file name and layout (optional)
         output_filename = "blast_results.json"
+        compact_json = True
 
-        # Run the BLAST search and save results to JSON
-        run_ncbi_blast_to_json(query_sequence, query_type, database_name, blast_program, output_filename)
+        # Run the BLAST search(es) and save results to JSON
+        if len(database_names) == 1:
+            run_ncbi_blast_to_json(query_sequence, query_type, database_names[0], blast_program, output_filename,
+                                   hitlist_size=hitlist_size, expect=expect_threshold,
+                                   word_size=word_size, megablast=use_megablast, compact=compact_json,
+                                   entrez_query=entrez_query, use_cache=not args.no_cache,
+                                   local_db=local_database)
+        else:
+            output_stem = os.path.splitext(output_filename)[0]
+            run_blast_batch([
+                {
+                    "query": query_sequence,
+                    "query_type": query_type,
+                    "database": database_name,
+                    "program": blast_program,
+                    "output_file": f"{output_stem}_{database_name}.json",
+                    "hitlist_size": hitlist_size,
+                    "expect": expect_threshold,
+                    "word_size": word_size,
+                    "megablast": use_megablast,
+                    "compact": compact_json,
+                    "entrez_query": entrez_query,
+                    "use_cache": not args.no_cache,
+                    "local_db": local_database
+                }
+                for database_name in database_names
+            ])
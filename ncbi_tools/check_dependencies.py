@@ -6,8 +6,17 @@ Dependency Checker for NCBI Data Retriever
 This script checks if all required dependencies are installed correctly.
 """
 
+import argparse
 import sys
 import importlib
+import importlib.util
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from importlib.metadata import distributions
+except ImportError:  # Python 3.7
+    distributions = None
 
 
 def check_python_version():
@@ -23,22 +32,74 @@ def check_python_version():
         return True
 
 
-def check_package(package_name, import_name=None, description=""):
-    """Check if a package is installed and importable."""
-    if import_name is None:
-        import_name = package_name
+def normalize_name(package_name):
+    """Normalize a package name the way pip does (e.g. "PyYAML" -> "pyyaml", "et_xmlfile" -> "et-xmlfile")."""
+    return re.sub(r"[-_.]+", "-", package_name).lower()
+
+
+def installed_distributions():
+    """
+    Return a {normalized package name: version} dict of everything pip has installed.
     
+    This reads the installed package metadata in a single scan, so every package
+    check afterwards is a dictionary lookup. Returns None on Python 3.7, where
+    importlib.metadata is not available.
+    """
+    if distributions is None:
+        return None
+    installed = {}
+    for dist in distributions():
+        name = dist.metadata["Name"]
+        if name:
+            installed[normalize_name(name)] = dist.version
+    return installed
+
+
+def is_importable(import_name, strict=False, package_name=None, installed=None):
+    """
+    Return True if the module is installed.
+    
+    By default the package is looked up in `installed` (from installed_distributions())
+    by its pip name, falling back to finding the module (find_spec) without running it.
+    Both are fast and avoid loading heavy packages like pandas. With strict=True the
+    module is actually imported, which also catches broken installations.
+    """
     try:
-        importlib.import_module(import_name)
-        print(f"✅ {package_name} - {description}")
-        return True
+        if strict:
+            importlib.import_module(import_name)
+            return True
+        if installed and normalize_name(package_name or import_name) in installed:
+            return True
+        return importlib.util.find_spec(import_name) is not None
     except ImportError:
-        print(f"❌ {package_name} - {description} (MISSING)")
         return False
 
 
+def report_package(package_name, description, ok):
+    """Print the check result for one package."""
+    if ok:
+        print(f"✅ {package_name} - {description}")
+    else:
+        print(f"❌ {package_name} - {description} (MISSING)")
+
+
+def check_package(package_name, import_name=None, description="", strict=False):
+    """Check if a package is installed (and, with strict=True, importable)."""
+    if import_name is None:
+        import_name = package_name
+    
+    ok = is_importable(import_name, strict, package_name)
+    report_package(package_name, description, ok)
+    return ok
+
+
 def main():
     """Check all dependencies."""
+    parser = argparse.ArgumentParser(description="Check that the NCBI Data Retriever's dependencies are installed.")
+    parser.add_argument("--strict", action="store_true",
+                        help="import every package instead of only checking that it is installed")
+    args = parser.parse_args()
+    
     print("=" * 60)
     print("NCBI Data Retriever - Dependency Checker")
     print("=" * 60)
@@ -58,24 +119,40 @@ def main():
         ("lxml", "lxml", "XML processing (required by python-docx)"),
     ]
     
-    required_ok = 0
-    for package, import_name, description in required_packages:
-        if check_package(package, import_name, description):
-            required_ok += 1
-    
-    print()
-    print("Checking optional packages:")
     optional_packages = [
         ("et-xmlfile", "et_xmlfile", "XML file support (required by openpyxl)"),
         ("python-dateutil", "dateutil", "Date utilities (required by pandas)"),
         ("pytz", "pytz", "Timezone support (required by pandas)"),
         ("numpy", "numpy", "Numerical computing (required by pandas)"),
+        ("orjson", "orjson", "Fast JSON encoding (speeds up BLAST JSON output)"),
     ]
     
+    # Read the installed package list once so each check is a quick lookup
+    installed = None if args.strict else installed_distributions()
+    
+    # Importing is mostly disk I/O, so probe all packages at once and
+    # print the results afterwards to keep the output in order
+    def probe(package):
+        package_name, import_name, description = package
+        return is_importable(import_name, args.strict, package_name, installed)
+    
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        required_results = executor.map(probe, required_packages)
+        optional_results = executor.map(probe, optional_packages)
+        required_results = list(required_results)
+        optional_results = list(optional_results)
+    
+    required_ok = 0
+    for (package, import_name, description), ok in zip(required_packages, required_results):
+        report_package(package, description, ok)
+        required_ok += ok
+    
+    print()
+    print("Checking optional packages:")
     optional_ok = 0
-    for package, import_name, description in optional_packages:
-        if check_package(package, import_name, description):
-            optional_ok += 1
+    for (package, import_name, description), ok in zip(optional_packages, optional_results):
+        report_package(package, description, ok)
+        optional_ok += ok
     
     # Summary
     print("\n" + "=" * 60)
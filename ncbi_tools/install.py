@@ -6,9 +6,12 @@ Installation Script for NCBI Data Retriever
 This script helps students install the required packages and set up the tool.
 """
 
+import hashlib
+import importlib.util
 import subprocess
 import sys
 import os
+from collections import deque
 from pathlib import Path
 
 
@@ -24,21 +27,92 @@ def check_python_version():
     return True
 
 
+# Records which requirements.txt was last installed into this Python environment
+INSTALL_STAMP = os.path.join(sys.prefix, ".bio357_install_stamp")
+
+# Import names of the packages the tool cannot run without
+CRITICAL_IMPORTS = ['requests', 'yaml', 'pandas', 'docx', 'openpyxl']
+
+
+def requirements_hash():
+    """Return a fingerprint of requirements.txt, or None if it cannot be read."""
+    try:
+        with open("requirements.txt", "rb") as f:
+            return hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+    except OSError:
+        return None
+
+
+def already_installed(req_hash):
+    """
+    Check whether this environment was already set up from the same requirements.txt.
+    
+    The stamp alone could be stale if packages were uninstalled later, so the
+    critical packages are also looked up (without importing them). Without a
+    readable requirements.txt (req_hash is None) nothing counts as installed.
+    """
+    if req_hash is None:
+        return False
+    try:
+        with open(INSTALL_STAMP, "r") as f:
+            if f.read().strip() != req_hash:
+                return False
+    except OSError:
+        return False
+    return all(importlib.util.find_spec(name) is not None for name in CRITICAL_IMPORTS)
+
+
+def write_install_stamp(req_hash):
+    """Remember that requirements.txt was installed (skipped if the environment is read-only)."""
+    if req_hash is None:
+        return
+    try:
+        with open(INSTALL_STAMP, "w") as f:
+            f.write(req_hash)
+    except OSError:
+        pass
+
+
+def run_streaming(command, tail_lines=200):
+    """
+    Run a command, showing its output live instead of buffering it.
+    
+    Only the last tail_lines lines are kept in memory, so a long pip run
+    doesn't accumulate its entire log just to report an error.
+    
+    Returns:
+        tuple: (return code, the last tail_lines lines of output as one string)
+    """
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                               text=True, bufsize=1)
+    tail = deque(maxlen=tail_lines)
+    for line in process.stdout:
+        sys.stdout.write(line)
+        tail.append(line)
+    return process.wait(), "".join(tail)
+
+
 def install_requirements():
     """Install required packages."""
     print("\n📦 Installing required packages...")
     
     try:
+        # Skip pip entirely if nothing has changed since the last successful install
+        req_hash = requirements_hash()
+        if already_installed(req_hash):
+            print("✅ All packages already installed (requirements.txt unchanged)")
+            return True
+        
         # Check if pip is available
         subprocess.run([sys.executable, "-m", "pip", "--version"], 
                       check=True, capture_output=True)
         
         # Install requirements with upgrade flag
-        result = subprocess.run([
+        returncode, output_tail = run_streaming([
             sys.executable, "-m", "pip", "install", "--upgrade", "-r", "requirements.txt"
-        ], capture_output=True, text=True)
+        ])
         
-        if result.returncode == 0:
+        if returncode == 0:
             print("✅ All packages installed successfully!")
             
             # Verify critical packages
@@ -58,9 +132,10 @@ def install_requirements():
                     print(f"   ❌ {package} - installation may have failed")
                     return False
             
+            write_install_stamp(req_hash)
             return True
         else:
-            print(f"❌ Error installing packages: {result.stderr}")
+            print(f"❌ Error installing packages (last lines of pip output):\n{output_tail}")
             print("\n🔧 Trying individual package installation...")
             return install_packages_individually()
             
@@ -73,9 +148,10 @@ def install_requirements():
 
 
 def install_packages_individually():
-    """Install packages one by one if batch installation fails."""
+    """Install the core packages directly if installing from requirements.txt fails."""
     packages = [
         'requests>=2.28.0',
+        'urllib3>=1.26.0',
         'PyYAML>=6.0',
         'pandas>=1.5.0',
         'openpyxl>=3.0.0',
@@ -84,12 +160,30 @@ def install_packages_individually():
         'et-xmlfile>=1.1.0'
     ]
     
+    # One pip run resolves everything at once, which is much faster than
+    # starting pip once per package
+    print(f"   Installing {len(packages)} packages...")
+    try:
+        returncode, _ = run_streaming([
+            sys.executable, "-m", "pip", "install", "--no-input", "--prefer-binary", *packages
+        ])
+        if returncode == 0:
+            for package in packages:
+                print(f"   ✅ {package}")
+            print(f"\n✅ {len(packages)}/{len(packages)} packages installed successfully")
+            return True
+    except Exception as e:
+        print(f"   ❌ {e}")
+    
+    # pip installs nothing if any package fails, so retry one at a time
+    # to install as many as possible
+    print("   Retrying packages one at a time...")
     success_count = 0
     for package in packages:
         try:
             print(f"   Installing {package}...")
             result = subprocess.run([
-                sys.executable, "-m", "pip", "install", package
+                sys.executable, "-m", "pip", "install", "--no-input", "--prefer-binary", package
             ], capture_output=True, text=True)
             
             if result.returncode == 0:
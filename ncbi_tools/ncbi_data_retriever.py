@@ -14,17 +14,23 @@ Version: 1.0
 import os
 import sys
 import time
+import string
+import codecs
+import itertools
+import shutil
 import logging
+import zipfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, fields
 
 # Try to import required modules with fallbacks
-try:
-    import yaml
-except ImportError:
-    print("Error: PyYAML is required. Install with: pip install PyYAML")
-    sys.exit(1)
-
+# (PyYAML, pandas, openpyxl and lxml are imported only when they are needed,
+# so reading a plain text file never pays for loading pandas)
 try:
     import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
 except ImportError:
     print("Error: requests is required. Install with: pip install requests")
     sys.exit(1)
@@ -35,45 +41,91 @@ except ImportError:
     print("Error: pathlib is required (Python 3.4+). Please upgrade Python.")
     sys.exit(1)
 
-# Optional typing support (Python 3.5+)
-try:
-    from typing import List, Dict, Any
-except ImportError:
-    # Fallback for older Python versions
-    List = list
-    Dict = dict
-    Any = object
-
-# File format support with error handling
-try:
-    import pandas as pd
-except ImportError:
-    print("Warning: pandas not available. CSV and Excel support disabled.")
-    pd = None
-
-try:
-    from docx import Document
-except ImportError:
-    print("Warning: python-docx not available. Word document support disabled.")
-    Document = None
-
-try:
-    import openpyxl
-except ImportError:
-    print("Warning: openpyxl not available. Excel support may be limited.")
-    openpyxl = None
+# Type hints (the typing module is always available on Python 3.7+)
+from typing import List, Dict, Any, Optional
 
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s',
     handlers=[
-        logging.FileHandler('ncbi_retriever.log'),
+        logging.FileHandler('ncbi_retriever.log', delay=True),
         logging.StreamHandler(sys.stdout)
     ]
 )
 logger = logging.getLogger(__name__)
 
+# NCBI E-utilities allow 3 requests per second, or 10 with an API key
+NCBI_REQUESTS_PER_SECOND = 3
+NCBI_REQUESTS_PER_SECOND_WITH_KEY = 10
+
+# HTTP status codes NCBI returns when it is rate limiting, overloaded or briefly failing
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# Labels that are removed from the start of an accession ID, e.g. "Accession: NM_000546"
+ACCESSION_ID_PREFIXES = ('Accession:', 'ACC:', 'ID:')
+
+# Characters allowed in an accession ID
+ACCESSION_ID_CHARS = string.ascii_letters + string.digits + '_.'
+
+
+# Column names that usually hold accession IDs in CSV and Excel files, in order of preference
+ACCESSION_COLUMN_NAMES = ('accession', 'accession_id', 'id', 'acc', 'sequence_id')
+
+# XML namespace of the main part (word/document.xml) of a .docx file
+WORD_NAMESPACE = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+
+
+@dataclass(frozen=True)
+class Config:
+    """
+    Settings loaded from the YAML configuration file.
+    
+    See config.yaml for what each setting does.
+    """
+    email: str
+    input_file_path: str
+    output_path: Optional[str] = None
+    batch_size: int = 200
+    delay_between_requests: Optional[float] = None
+    api_key: Optional[str] = None
+    max_concurrent_requests: int = 3
+    force_refresh: bool = False
+    cache_ttl_days: Optional[float] = 30
+    incremental: bool = True
+    download_genbank: bool = True
+    download_fasta: bool = True
+
+
+class TokenBucket:
+    """
+    A thread-safe token-bucket rate limiter.
+    
+    Tokens refill continuously at `rate` per second up to `capacity`, and
+    acquire() takes one token, sleeping first if none is available. Sharing
+    one bucket between worker threads keeps their combined request rate
+    under the limit.
+    """
+    
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.last = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self) -> None:
+        """Wait until a token is available and take it."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            if self.tokens < 1:
+                time.sleep((1 - self.tokens) / self.rate)
+                self.tokens = 1
+                self.last = time.monotonic()
+            self.tokens -= 1
+
 
 class NCBIDataRetriever:
     """
@@ -93,12 +145,44 @@ class NCBIDataRetriever:
         self.config = self._load_config(config_file)
         self.session = requests.Session()
         self.session.headers.update({
-            'User-Agent': f'NCBI_Data_Retriever/1.0 ({self.config["email"]})'
+            'User-Agent': f'NCBI_Data_Retriever/1.0 ({self.config.email})',
+            'Accept-Encoding': 'gzip, deflate'
         })
         
+        # Keep one open connection per worker thread (GenBank and FASTA each
+        # have their own workers), so every request after the first reuses
+        # it instead of setting up a new TLS connection.
+        # Connection errors and responses saying NCBI is busy are retried
+        # with exponential backoff, waiting as long as NCBI asks (Retry-After)
+        pool_size = 2 * max(1, self.config.max_concurrent_requests)
+        retry = Retry(
+            total=5,
+            backoff_factor=0.5,
+            status_forcelist=RETRY_STATUS_CODES,
+            allowed_methods=['GET', 'POST'],
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(max_retries=retry, pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        
+        # Stay under NCBI's request limit across all worker threads;
+        # delay_between_requests, if set, slows requests down further
+        if self.config.api_key:
+            rate = NCBI_REQUESTS_PER_SECOND_WITH_KEY
+        else:
+            rate = NCBI_REQUESTS_PER_SECOND
+        delay = self.config.delay_between_requests
+        if delay:
+            rate = min(rate, 1 / delay)
+        self._limiter = TokenBucket(rate=rate)
+        
+        working_dir = Path.cwd()
+        
         # Create output directory if it doesn't exist
-        if self.config.get('output_path'):
-            output_path = self.config['output_path']
+        if self.config.output_path:
+            output_path = self.config.output_path
             try:
                 os.makedirs(output_path, exist_ok=True)
                 self.output_dir = Path(output_path).resolve()
@@ -106,15 +190,19 @@ class NCBIDataRetriever:
             except Exception as e:
                 logger.warning(f"Could not create output directory '{output_path}': {e}")
                 logger.info("Using current directory instead")
-                self.output_dir = Path.cwd()
+                self.output_dir = working_dir
         else:
-            self.output_dir = Path.cwd()
+            self.output_dir = working_dir
+        
+        # Downloaded records are cached per accession so repeated runs skip NCBI
+        self.cache_dir = self.output_dir / ".cache"
+        self.cache_dir.mkdir(exist_ok=True)
             
         logger.info(f"NCBI Data Retriever initialized")
-        logger.info(f"Working directory: {Path.cwd()}")
+        logger.info(f"Working directory: {working_dir}")
         logger.info(f"Output directory: {self.output_dir}")
     
-    def _load_config(self, config_file: str) -> Dict[str, Any]:
+    def _load_config(self, config_file: str) -> Config:
         """
         Load configuration from YAML file.
         
@@ -122,11 +210,20 @@ class NCBIDataRetriever:
             config_file (str): Path to configuration file
             
         Returns:
-            Dict[str, Any]: Configuration dictionary
+            Config: The validated configuration, with defaults for missing optional settings
         """
+        try:
+            import yaml
+        except ImportError:
+            logger.error("PyYAML is required. Install with: pip install PyYAML")
+            sys.exit(1)
+        
         try:
             with open(config_file, 'r') as file:
-                config = yaml.safe_load(file)
+                config = yaml.safe_load(file) or {}
+            
+            if not isinstance(config, dict):
+                raise ValueError("The config file must contain settings like 'email: ...', one per line")
             
             # Validate required fields
             required_fields = ['email', 'input_file_path']
@@ -134,13 +231,14 @@ class NCBIDataRetriever:
                 if field not in config:
                     raise ValueError(f"Required field '{field}' not found in config file")
             
-            # Set defaults for optional fields
-            config.setdefault('batch_size', 200)
-            config.setdefault('delay_between_requests', 0.5)
-            config.setdefault('download_genbank', True)
-            config.setdefault('download_fasta', True)
+            # Catch misspelled settings instead of silently using the default
+            known_fields = {field.name for field in fields(Config)}
+            unknown_fields = sorted(str(key) for key in config if key not in known_fields)
+            if unknown_fields:
+                raise ValueError(f"Unknown setting(s) in config file: {', '.join(unknown_fields)}")
             
-            return config
+            # Optional fields that are missing get their defaults from Config
+            return Config(**config)
             
         except FileNotFoundError:
             logger.error(f"Configuration file '{config_file}' not found!")
@@ -152,7 +250,7 @@ class NCBIDataRetriever:
             logger.error(f"Error loading configuration: {e}")
             sys.exit(1)
     
-    def _read_accession_ids(self, file_path: str) -> List[str]:
+    def _read_accession_ids(self, file_path) -> List[str]:
         """
         Read accession IDs from various file formats.
         
@@ -163,15 +261,19 @@ class NCBIDataRetriever:
         - .docx: Word documents
         
         Args:
-            file_path (str): Path to the input file
+            file_path (str or Path): Path to the input file
             
         Returns:
             List[str]: List of accession IDs
         """
-        file_path = Path(file_path)
+        if not isinstance(file_path, Path):
+            file_path = Path(file_path)
         
         # Check if file exists and provide helpful error message
-        if not file_path.exists():
+        # (a single stat call also gives the file size logged below)
+        try:
+            file_stat = os.stat(file_path)
+        except FileNotFoundError:
             # Try to provide helpful suggestions
             current_dir = Path.cwd()
             logger.error(f"Input file '{file_path}' not found!")
@@ -186,16 +288,17 @@ class NCBIDataRetriever:
             raise FileNotFoundError(f"Input file '{file_path}' not found! See log for troubleshooting tips.")
         
         logger.info(f"Reading accession IDs from: {file_path}")
-        logger.info(f"File size: {file_path.stat().st_size} bytes")
+        logger.info(f"File size: {file_stat.st_size} bytes")
         
         try:
-            if file_path.suffix.lower() == '.txt':
+            suffix = file_path.suffix.lower()
+            if suffix == '.txt':
                 return self._read_txt_file(file_path)
-            elif file_path.suffix.lower() == '.csv':
+            elif suffix == '.csv':
                 return self._read_csv_file(file_path)
-            elif file_path.suffix.lower() in ['.xlsx', '.xls']:
+            elif suffix in ['.xlsx', '.xls']:
                 return self._read_excel_file(file_path)
-            elif file_path.suffix.lower() == '.docx':
+            elif suffix == '.docx':
                 return self._read_docx_file(file_path)
             else:
                 raise ValueError(f"Unsupported file format: {file_path.suffix}")
@@ -206,91 +309,142 @@ class NCBIDataRetriever:
     
     def _read_txt_file(self, file_path: Path) -> List[str]:
         """Read accession IDs from a plain text file."""
-        with open(file_path, 'r', encoding='utf-8') as file:
-            lines = file.readlines()
-        
-        # Clean and filter lines
-        accession_ids = []
-        for line in lines:
-            line = line.strip()
-            if line and not line.startswith('#'):  # Skip empty lines and comments
-                accession_ids.append(line)
+        with open(file_path, 'rb') as file:
+            text = file.read().decode('utf-8', errors='replace')
         
-        return accession_ids
+        # Clean and filter lines, skipping empty lines and comments
+        return [line for line in map(str.strip, text.splitlines()) if line and not line.startswith('#')]
     
-    def _read_csv_file(self, file_path: Path) -> List[str]:
-        """Read accession IDs from a CSV file."""
-        if pd is None:
-            raise ImportError("pandas is required for CSV file support. Install with: pip install pandas")
+    @staticmethod
+    def _match_accession_column(columns: List[str]) -> str:
+        """
+        Find the column with accession IDs, ignoring case.
+        
+        Args:
+            columns (List[str]): Column names from the file's header row
+            
+        Returns:
+            str: The matching column name, or the first column if none look like accession IDs
+        """
+        lower_columns = {}
+        for column in columns:
+            lower_columns.setdefault(str(column).lower(), column)
         
-        df = pd.read_csv(file_path)
+        for name in ACCESSION_COLUMN_NAMES:
+            if name in lower_columns:
+                return lower_columns[name]
         
-        # Try to find a column with accession IDs
-        possible_columns = ['accession', 'accession_id', 'id', 'acc', 'sequence_id']
-        accession_column = None
+        # If no obvious column found, use the first column
+        logger.warning(f"No obvious accession column found. Using first column: {columns[0]}")
+        return columns[0]
+    
+    def _read_csv_file(self, file_path: Path) -> List[str]:
+        """
+        Read accession IDs from a CSV file.
         
-        for col in possible_columns:
-            if col.lower() in [c.lower() for c in df.columns]:
-                accession_column = col
-                break
+        Only the header is read to pick the accession column, and then only
+        that column is parsed, as plain text.
+        """
+        try:
+            import pandas as pd
+        except ImportError:
+            raise ImportError("pandas is required for CSV file support. Install with: pip install pandas")
         
-        if accession_column is None:
-            # If no obvious column found, use the first column
-            accession_column = df.columns[0]
-            logger.warning(f"No obvious accession column found. Using first column: {accession_column}")
+        accession_column = self._match_accession_column(list(pd.read_csv(file_path, nrows=0).columns))
         
-        accession_ids = df[accession_column].dropna().astype(str).tolist()
+        df = pd.read_csv(file_path, usecols=[accession_column], dtype=str, engine='c')
+        accession_ids = df[accession_column].dropna().tolist()
         return [acc.strip() for acc in accession_ids if acc.strip()]
     
     def _read_excel_file(self, file_path: Path) -> List[str]:
-        """Read accession IDs from an Excel file."""
-        if pd is None:
-            raise ImportError("pandas is required for Excel file support. Install with: pip install pandas")
+        """
+        Read accession IDs from an Excel file.
         
-        df = pd.read_excel(file_path)
+        .xlsx files are streamed row by row with openpyxl in read-only mode;
+        older .xls files are read with pandas.
+        """
+        try:
+            import openpyxl
+        except ImportError:
+            openpyxl = None
         
-        # Try to find a column with accession IDs
-        possible_columns = ['accession', 'accession_id', 'id', 'acc', 'sequence_id']
-        accession_column = None
+        if file_path.suffix.lower() == '.xls' or openpyxl is None:
+            return self._read_excel_file_with_pandas(file_path)
         
-        for col in possible_columns:
-            if col.lower() in [c.lower() for c in df.columns]:
-                accession_column = col
-                break
+        workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            columns = ["" if c is None else str(c) for c in next(rows, ())]
+            if not columns:
+                raise ValueError(f"No data found in Excel file '{file_path}'")
+            accession_index = columns.index(self._match_accession_column(columns))
+            
+            accession_ids = [str(row[accession_index]).strip() for row in rows
+                             if len(row) > accession_index and row[accession_index] is not None]
+        finally:
+            workbook.close()
         
-        if accession_column is None:
-            # If no obvious column found, use the first column
-            accession_column = df.columns[0]
-            logger.warning(f"No obvious accession column found. Using first column: {accession_column}")
+        return [acc for acc in accession_ids if acc]
+    
+    def _read_excel_file_with_pandas(self, file_path: Path) -> List[str]:
+        """Read accession IDs from an Excel file with pandas (needed for .xls files)."""
+        try:
+            import pandas as pd
+        except ImportError:
+            raise ImportError("pandas is required for Excel file support. Install with: pip install pandas")
+        
+        df = pd.read_excel(file_path)
+        accession_column = self._match_accession_column(list(df.columns))
         
         accession_ids = df[accession_column].dropna().astype(str).tolist()
         return [acc.strip() for acc in accession_ids if acc.strip()]
     
     def _read_docx_file(self, file_path: Path) -> List[str]:
-        """Read accession IDs from a Word document."""
-        if Document is None:
-            raise ImportError("python-docx is required for Word document support. Install with: pip install python-docx")
+        """
+        Read accession IDs from a Word document.
         
-        doc = Document(file_path)
+        The document XML is streamed paragraph by paragraph (this includes the
+        paragraphs inside tables) instead of loading the whole document.
+        """
+        # Use lxml when available, it is much faster than the standard library parser
+        try:
+            from lxml import etree
+            have_lxml = True
+        except ImportError:
+            import xml.etree.ElementTree as etree
+            have_lxml = False
+        
+        paragraph_tag = WORD_NAMESPACE + 'p'
+        text_tag = WORD_NAMESPACE + 't'
+        # Line breaks and tabs inside a paragraph, as python-docx reads them
+        break_tags = {WORD_NAMESPACE + 'br': '\n', WORD_NAMESPACE + 'cr': '\n', WORD_NAMESPACE + 'tab': '\t'}
         accession_ids = []
         
-        # Extract text from paragraphs
-        for paragraph in doc.paragraphs:
-            text = paragraph.text.strip()
-            if text and not text.startswith('#'):
-                # Split by common delimiters
-                for line in text.split('\n'):
-                    line = line.strip()
-                    if line:
-                        accession_ids.append(line)
-        
-        # Also check tables
-        for table in doc.tables:
-            for row in table.rows:
-                for cell in row.cells:
-                    text = cell.text.strip()
-                    if text and not text.startswith('#'):
-                        accession_ids.append(text)
+        with zipfile.ZipFile(file_path) as docx, docx.open('word/document.xml') as document:
+            if have_lxml:
+                events = etree.iterparse(document, events=('end',), tag=paragraph_tag)
+            else:
+                events = etree.iterparse(document, events=('end',))
+            
+            for _, elem in events:
+                if elem.tag != paragraph_tag:
+                    continue
+                
+                # A paragraph's text can be split over several runs
+                parts = []
+                for child in elem.iter():
+                    if child.tag == text_tag:
+                        parts.append(child.text or "")
+                    elif child.tag in break_tags:
+                        parts.append(break_tags[child.tag])
+                text = "".join(parts).strip()
+                if text and not text.startswith('#'):
+                    # A paragraph can hold several lines (soft line breaks)
+                    for line in text.split('\n'):
+                        line = line.strip()
+                        if line:
+                            accession_ids.append(line)
+                elem.clear()
         
         return accession_ids
     
@@ -307,135 +461,397 @@ class NCBIDataRetriever:
         cleaned_ids = []
         
         for acc_id in accession_ids:
-            # Remove common prefixes and clean up
-            acc_id = acc_id.strip()
-            acc_id = acc_id.replace('Accession:', '').replace('ACC:', '').replace('ID:', '')
+            # Remove common prefixes (most IDs have none, so check for any first)
             acc_id = acc_id.strip()
+            if acc_id.startswith(ACCESSION_ID_PREFIXES):
+                for prefix in ACCESSION_ID_PREFIXES:
+                    if acc_id.startswith(prefix):
+                        acc_id = acc_id[len(prefix):].lstrip()
+                        break
             
-            # Basic validation (NCBI accession IDs are typically alphanumeric)
-            if acc_id and acc_id.replace('_', '').replace('.', '').isalnum():
+            # Basic validation (NCBI accession IDs are alphanumeric, plus "_" and ".");
+            # stripping every allowed character leaves nothing behind for a valid ID
+            if acc_id and not acc_id.strip(ACCESSION_ID_CHARS):
                 cleaned_ids.append(acc_id)
-            else:
-                logger.warning(f"Skipping invalid accession ID: {acc_id}")
+        
+        skipped = len(accession_ids) - len(cleaned_ids)
+        if skipped:
+            logger.warning(f"Skipped {skipped} invalid accession IDs")
         
         # Remove duplicates while preserving order
-        seen = set()
-        unique_ids = []
-        for acc_id in cleaned_ids:
-            if acc_id not in seen:
-                seen.add(acc_id)
-                unique_ids.append(acc_id)
+        unique_ids = list(dict.fromkeys(cleaned_ids))
         
         logger.info(f"Found {len(unique_ids)} unique accession IDs")
         return unique_ids
     
-    def _download_from_ncbi(self, accession_ids: List[str], file_format: str) -> Dict[str, str]:
+    def _ncbi_post(self, url: str, params: Dict[str, Any], stream: bool = False):
+        """
+        Make a rate-limited POST request to NCBI.
+        
+        The parameters are sent in the request body, so long lists of
+        accession IDs never run into URL length limits.
+        
+        Failed requests are retried by the session's HTTPAdapter (see __init__).
+        
+        Args:
+            url (str): E-utilities endpoint URL
+            params (Dict[str, Any]): Request parameters
+            stream (bool): Leave the response body unread so it can be streamed
+            
+        Returns:
+            requests.Response: The successful response
+        """
+        if self.config.api_key:
+            params = dict(params, api_key=self.config.api_key)
+        
+        self._limiter.acquire()
+        response = self.session.post(url, data=params, stream=stream, timeout=60)
+        response.raise_for_status()
+        return response
+    
+    def _seen_path(self, file_format: str) -> Path:
+        """Return the file listing accession IDs already downloaded in a format."""
+        return self.cache_dir / f"seen_{file_format}.txt"
+    
+    def _load_seen(self, file_format: str) -> set:
+        """Return the accession IDs downloaded in a format by earlier runs."""
+        try:
+            return set(self._seen_path(file_format).read_text(encoding='utf-8').split())
+        except OSError:
+            return set()
+    
+    def _save_seen(self, file_format: str, accession_ids: set) -> None:
+        """Replace the list of downloaded accession IDs for a format, without ever leaving a partial file."""
+        seen_path = self._seen_path(file_format)
+        temp_path = seen_path.with_name(f"{seen_path.name}.tmp")
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.write("".join(f"{acc_id}\n" for acc_id in sorted(accession_ids)))
+            os.replace(temp_path, seen_path)
+        except OSError as e:
+            logger.warning(f"Could not save the list of downloaded {file_format} accession IDs: {e}")
+    
+    def _next_batch_number(self, file_format: str) -> int:
+        """Return the first batch number not used by an existing batch file of a format."""
+        numbers = [0]
+        for path in self.output_dir.glob(f"batch_*_{file_format}.*"):
+            number = path.name.split('_')[1]
+            if number.isdigit():
+                numbers.append(int(number))
+        return max(numbers) + 1
+    
+    def _download_new(self, accession_ids: List[str], file_format: str) -> Dict[str, str]:
+        """
+        Download one format, skipping accession IDs that earlier runs already downloaded.
+        
+        Successfully downloaded IDs are remembered in the cache folder, so
+        running the tool again (for example after adding IDs to the input
+        file, or after an interrupted run) only downloads what is missing.
+        The new batch files are numbered after the existing ones, so earlier
+        downloads are never overwritten. Set incremental to false in the
+        config to always download everything. force_refresh also downloads
+        everything again, into new batch files after the existing ones.
+        
+        Args:
+            accession_ids (List[str]): List of accession IDs
+            file_format (str): Format to download ('genbank' or 'fasta')
+            
+        Returns:
+            Dict[str, str]: Dictionary mapping newly downloaded accession IDs to file paths
+        """
+        if not self.config.incremental:
+            return self._download_from_ncbi(accession_ids, file_format)
+        
+        seen = self._load_seen(file_format)
+        if self.config.force_refresh:
+            new_ids = accession_ids
+        else:
+            new_ids = [acc_id for acc_id in accession_ids if acc_id not in seen]
+        
+        skipped = len(accession_ids) - len(new_ids)
+        if skipped:
+            logger.info(f"Skipping {skipped} accession IDs already downloaded in {file_format} format by an earlier run")
+        if not new_ids:
+            return {}
+        
+        downloaded_files = self._download_from_ncbi(new_ids, file_format, self._next_batch_number(file_format))
+        if downloaded_files:
+            self._save_seen(file_format, seen.union(downloaded_files))
+        return downloaded_files
+    
+    def _download_from_ncbi(self, accession_ids: List[str], file_format: str,
+                            first_batch_number: int = 1) -> Dict[str, str]:
         """
         Download sequences from NCBI using Entrez API.
         
+        Batches are downloaded by a small pool of worker threads, so several
+        requests to NCBI are in flight at once instead of waiting on each other.
+        
         Args:
             accession_ids (List[str]): List of accession IDs
             file_format (str): Format to download ('genbank' or 'fasta')
+            first_batch_number (int): Number of the first batch file
             
         Returns:
-            Dict[str, str]: Dictionary mapping accession IDs to file paths
+            Dict[str, str]: Dictionary mapping accession IDs to file paths (IDs
+            NCBI returned no record for are left out)
         """
-        base_url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/"
         downloaded_files = {}
         
         # Process in batches
-        batch_size = self.config.get('batch_size', 200)
-        delay = self.config.get('delay_between_requests', 0.5)
-        
-        for i in range(0, len(accession_ids), batch_size):
-            batch = accession_ids[i:i + batch_size]
-            logger.info(f"Processing batch {i//batch_size + 1}/{(len(accession_ids)-1)//batch_size + 1} for {file_format} format")
-            logger.info(f"Batch contains {len(batch)} accession IDs: {batch[:3]}{'...' if len(batch) > 3 else ''}")
+        batch_size = self.config.batch_size
+        max_workers = max(1, self.config.max_concurrent_requests)
+        batches = [accession_ids[i:i + batch_size] for i in range(0, len(accession_ids), batch_size)]
+        last_batch_number = first_batch_number + len(batches) - 1
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = executor.map(
+                lambda numbered: self._download_batch(numbered[0], last_batch_number, numbered[1], file_format),
+                enumerate(batches, start=first_batch_number)
+            )
             
-            try:
-                # Step 1: Search for the accession IDs
-                search_url = f"{base_url}esearch.fcgi"
-                search_params = {
-                    'db': 'nucleotide',
-                    'term': ' OR '.join(batch),
-                    'retmode': 'json',
-                    'retmax': len(batch)
-                }
-                
-                response = self.session.get(search_url, params=search_params)
-                response.raise_for_status()
-                search_data = response.json()
-                
-                if 'esearchresult' not in search_data or not search_data['esearchresult']['idlist']:
-                    logger.warning(f"No results found for batch starting at index {i}")
+            for result in results:
+                if result is None:
                     continue
                 
-                # Step 2: Fetch the sequences
+                # Map accession IDs to file paths
+                batch_filepath, found_ids = result
+                for acc_id in found_ids:
+                    downloaded_files[acc_id] = batch_filepath
+        
+        return downloaded_files
+    
+    def _cache_path(self, acc_id: str, rettype: str) -> Path:
+        """Return the cache file path for one accession ID in one format."""
+        return self.cache_dir / f"{acc_id}.{rettype}"
+    
+    def _cached_record_path(self, acc_id: str, rettype: str):
+        """
+        Return the cache file for an accession ID, or None if it must be downloaded.
+        
+        Cached records older than cache_ttl_days are ignored, and so is the
+        whole cache when force_refresh is set.
+        """
+        if self.config.force_refresh:
+            return None
+        
+        cache_path = self._cache_path(acc_id, rettype)
+        try:
+            ttl_days = self.config.cache_ttl_days
+            if ttl_days is not None and time.time() - cache_path.stat().st_mtime > ttl_days * 86400:
+                return None
+        except OSError:
+            return None
+        return cache_path
+    
+    def _write_cached_record(self, acc_id: str, rettype: str, record: str) -> bool:
+        """
+        Save one record to the cache without ever leaving a partial file behind.
+        
+        Returns:
+            bool: True if the record was cached
+        """
+        cache_path = self._cache_path(acc_id, rettype)
+        temp_path = cache_path.with_name(f"{cache_path.name}.{threading.get_ident()}.tmp")
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.write(record)
+            os.replace(temp_path, cache_path)
+            return True
+        except OSError as e:
+            logger.warning(f"Could not cache {acc_id}: {e}")
+            return False
+    
+    @staticmethod
+    def _iter_lines(chunks):
+        """
+        Decode a stream of UTF-8 byte chunks and yield it line by line.
+        
+        Lines keep their newline, and a line split across two chunks (or a
+        character split across two chunks) is joined back together.
+        """
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        pending = ''
+        for chunk in chunks:
+            lines = (pending + decoder.decode(chunk)).split('\n')
+            pending = lines.pop()
+            for line in lines:
+                yield line + '\n'
+        pending += decoder.decode(b'', final=True)
+        if pending:
+            yield pending
+    
+    def _iter_records(self, file, rettype: str):
+        """
+        Split an efetch response into individual records, one record at a time.
+        
+        Args:
+            file: Lines of text (for example a file, or _iter_lines() of a response)
+                containing GenBank or FASTA records for several sequences
+            rettype (str): NCBI rettype of the response ('gb' or 'fasta')
+            
+        Yields:
+            tuple: (accession IDs, record text), where the accession IDs are the
+            forms the record could have been requested by (with and without version)
+        """
+        lines = []
+        names = set()
+        
+        for line in file:
+            if rettype == 'gb':
+                if line.startswith(('VERSION', 'ACCESSION')):
+                    words = line.split()
+                    if len(words) > 1:
+                        names.update([words[1], words[1].split('.')[0]])
+                lines.append(line)
+                if line.rstrip() == '//':
+                    yield names, "".join(lines)
+                    lines, names = [], set()
+            else:
+                if line.startswith('>'):
+                    if any(l.strip() for l in lines):
+                        yield names, "".join(lines)
+                    lines = []
+                    header = line[1:].split(None, 1)
+                    names = {header[0], header[0].split('.')[0]} if header else set()
+                lines.append(line)
+        
+        if any(l.strip() for l in lines):
+            record = "".join(lines).rstrip('\n') + "\n"
+            if rettype == 'gb':
+                record += "//\n"
+            yield names, record
+    
+    def _download_batch(self, batch_number: int, total_batches: int, batch: List[str], file_format: str):
+        """
+        Download one batch of sequences and save it to a batch file.
+        
+        Records already in the cache are reused, and only the rest are
+        requested from NCBI. Downloads are split into records while they
+        stream in and each record goes straight to the cache, so memory use
+        stays at about one record no matter how large the batch is.
+        
+        Args:
+            batch_number (int): 1-based number of this batch
+            total_batches (int): Total number of batches
+            batch (List[str]): Accession IDs in this batch
+            file_format (str): Format to download ('genbank' or 'fasta')
+            
+        Returns:
+            tuple: (path of the saved batch file, accession IDs in the batch that
+            got a record), or None if the batch failed
+        """
+        base_url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/"
+        
+        start_time = time.monotonic()
+        logger.debug("Processing batch %d/%d for %s format: %s%s", batch_number, total_batches,
+                     file_format, batch[:3], '...' if len(batch) > 3 else '')
+        
+        # Map file format to correct NCBI rettype parameter
+        if file_format == 'genbank':
+            rettype = 'gb'
+        elif file_format == 'fasta':
+            rettype = 'fasta'
+        else:
+            rettype = file_format
+        
+        # Save the batch file with appropriate extension
+        if file_format == 'genbank':
+            file_extension = 'genbank'
+        elif file_format == 'fasta':
+            file_extension = 'fasta'
+        else:
+            file_extension = file_format
+        
+        batch_filename = f"batch_{batch_number}_{file_format}.{file_extension}"
+        batch_filepath = self.output_dir / batch_filename
+        
+        try:
+            # Step 1: Use cached records where possible
+            record_paths = {}
+            for acc_id in batch:
+                cache_path = self._cached_record_path(acc_id, rettype)
+                if cache_path is not None:
+                    record_paths[acc_id] = cache_path
+            misses = [acc_id for acc_id in batch if acc_id not in record_paths]
+            uncached_records = []
+            
+            cached = len(record_paths)
+            downloaded = 0
+            fetch_failed = False
+            
+            if misses:
+                # Step 2: Fetch the sequences (efetch accepts accession IDs directly)
                 fetch_url = f"{base_url}efetch.fcgi"
-                
-                # Map file format to correct NCBI rettype parameter
-                if file_format == 'genbank':
-                    rettype = 'gb'
-                elif file_format == 'fasta':
-                    rettype = 'fasta'
-                else:
-                    rettype = file_format
-                
                 fetch_params = {
                     'db': 'nucleotide',
-                    'id': ','.join(search_data['esearchresult']['idlist']),
+                    'id': ','.join(misses),
                     'rettype': rettype,
                     'retmode': 'text'
                 }
                 
-                logger.info(f"Fetching {file_format} format using rettype={rettype}")
-                
-                response = self.session.get(fetch_url, params=fetch_params)
-                response.raise_for_status()
-                
-                # Check if we got actual data
-                response_text = response.text.strip()
-                if not response_text:
-                    logger.warning(f"No data received for {file_format} format in batch {i//batch_size + 1}")
-                    continue
-                
-                # Check for error messages in response
-                if "Error" in response_text or "error" in response_text:
-                    logger.warning(f"Error in {file_format} response: {response_text[:200]}...")
-                    continue
-                
-                # Save the batch file with appropriate extension
-                if file_format == 'genbank':
-                    file_extension = 'genbank'
-                elif file_format == 'fasta':
-                    file_extension = 'fasta'
-                else:
-                    file_extension = file_format
+                logger.debug("Fetching batch %d in %s format using rettype=%s", batch_number, file_format, rettype)
                 
-                batch_filename = f"batch_{i//batch_size + 1}_{file_format}.{file_extension}"
-                batch_filepath = self.output_dir / batch_filename
-                
-                with open(batch_filepath, 'w', encoding='utf-8') as f:
-                    f.write(response_text)
-                
-                logger.info(f"✅ Downloaded {len(search_data['esearchresult']['idlist'])} sequences to {batch_filepath}")
-                logger.info(f"   File size: {len(response_text)} characters")
-                
-                # Map accession IDs to file paths
+                with self._ncbi_post(fetch_url, fetch_params, stream=True) as response:
+                    chunks = response.iter_content(chunk_size=64 * 1024)
+                    
+                    # Look at the start of the response before saving anything
+                    peek = bytearray()
+                    for chunk in chunks:
+                        peek += chunk
+                        if len(peek) >= 4096:
+                            break
+                    
+                    # Check if we got actual data, and for error messages in the response.
+                    # Records taken from the cache are still saved if the fetch fails.
+                    peek_text = peek[:4096].decode('utf-8', errors='replace')
+                    if not peek.strip():
+                        logger.warning(f"No data received for {file_format} format in batch {batch_number}")
+                        fetch_failed = True
+                    elif "Error" in peek_text or "error" in peek_text:
+                        logger.warning(f"Error in {file_format} response: {peek_text.strip()[:200]}...")
+                        fetch_failed = True
+                    else:
+                        # Cache each record under the accession ID it was requested by
+                        lines = self._iter_lines(itertools.chain([bytes(peek)], chunks))
+                        for names, record in self._iter_records(lines, rettype):
+                            downloaded += 1
+                            acc_id = next((acc_id for acc_id in misses if acc_id in names and acc_id not in record_paths), None)
+                            if acc_id is not None and self._write_cached_record(acc_id, rettype, record):
+                                record_paths[acc_id] = self._cache_path(acc_id, rettype)
+                            else:
+                                uncached_records.append(record)
+            
+            if fetch_failed and not record_paths:
+                return None
+            
+            # Keep the records in the same order as the input file
+            with open(batch_filepath, 'wb') as f:
                 for acc_id in batch:
-                    downloaded_files[acc_id] = str(batch_filepath)
-                
-                # Be respectful to NCBI servers
-                time.sleep(delay)
-                
-            except requests.exceptions.RequestException as e:
-                logger.error(f"Error downloading batch {i//batch_size + 1}: {e}")
-                continue
-            except Exception as e:
-                logger.error(f"Unexpected error processing batch {i//batch_size + 1}: {e}")
-                continue
-        
-        return downloaded_files
+                    if acc_id in record_paths:
+                        with open(record_paths[acc_id], 'rb') as record_file:
+                            shutil.copyfileobj(record_file, f)
+                for record in uncached_records:
+                    f.write(record.encode('utf-8'))
+            
+            logger.info(f"✅ Batch {batch_number}/{total_batches} ({file_format}): "
+                        f"{len(record_paths) + len(uncached_records)} sequences "
+                        f"({downloaded} downloaded, {cached} cached) saved to {batch_filepath} "
+                        f"[{batch_filepath.stat().st_size} bytes, {time.monotonic() - start_time:.1f}s]")
+            
+            missing = [acc_id for acc_id in batch if acc_id not in record_paths]
+            if missing and not uncached_records:
+                logger.warning(f"NCBI returned no {file_format} record for {len(missing)} accession IDs "
+                               f"in batch {batch_number}: {', '.join(missing[:5])}{'...' if len(missing) > 5 else ''}")
+            
+            return str(batch_filepath), [acc_id for acc_id in batch if acc_id in record_paths]
+            
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Error downloading batch {batch_number}: {e}")
+            return None
+        except Exception as e:
+            logger.error(f"Unexpected error processing batch {batch_number}: {e}")
+            return None
     
     def retrieve_data(self) -> None:
         """
@@ -443,7 +859,7 @@ class NCBIDataRetriever:
         """
         try:
             # Read accession IDs from input file
-            raw_accession_ids = self._read_accession_ids(self.config['input_file_path'])
+            raw_accession_ids = self._read_accession_ids(self.config.input_file_path)
             accession_ids = self._clean_accession_ids(raw_accession_ids)
             
             if not accession_ids:
@@ -452,30 +868,36 @@ class NCBIDataRetriever:
             
             logger.info(f"Starting download for {len(accession_ids)} accession IDs")
             
-            # Download GenBank files if requested
-            if self.config.get('download_genbank', True):
-                logger.info("=" * 50)
-                logger.info("DOWNLOADING GENBANK FILES")
-                logger.info("=" * 50)
-                genbank_files = self._download_from_ncbi(accession_ids, 'genbank')
-                logger.info(f"✅ Downloaded {len(genbank_files)} GenBank files")
-                if genbank_files:
-                    logger.info(f"GenBank files saved to: {list(genbank_files.values())[0]}")
+            # Work out which formats were requested
+            formats = []
+            if self.config.download_genbank:
+                formats.append(('genbank', 'GenBank'))
             else:
                 logger.info("⏭️  Skipping GenBank download (disabled in config)")
             
-            # Download FASTA files if requested
-            if self.config.get('download_fasta', True):
-                logger.info("=" * 50)
-                logger.info("DOWNLOADING FASTA FILES")
-                logger.info("=" * 50)
-                fasta_files = self._download_from_ncbi(accession_ids, 'fasta')
-                logger.info(f"✅ Downloaded {len(fasta_files)} FASTA files")
-                if fasta_files:
-                    logger.info(f"FASTA files saved to: {list(fasta_files.values())[0]}")
+            if self.config.download_fasta:
+                formats.append(('fasta', 'FASTA'))
             else:
                 logger.info("⏭️  Skipping FASTA download (disabled in config)")
             
+            if formats:
+                logger.info("=" * 50)
+                logger.info(f"DOWNLOADING {' AND '.join(label.upper() for _, label in formats)} FILES")
+                logger.info("=" * 50)
+                
+                # Download the formats at the same time; they share one rate
+                # limiter, so together they still stay under NCBI's limit
+                with ThreadPoolExecutor(max_workers=len(formats)) as executor:
+                    results = list(executor.map(
+                        lambda file_format: self._download_new(accession_ids, file_format),
+                        [file_format for file_format, _ in formats]
+                    ))
+                
+                for (file_format, label), downloaded_files in zip(formats, results):
+                    logger.info(f"✅ Downloaded {len(downloaded_files)} {label} files")
+                    if downloaded_files:
+                        logger.info(f"{label} files saved to: {list(downloaded_files.values())[0]}")
+            
             logger.info("Download completed successfully!")
             
         except Exception as e:
@@ -7,15 +7,22 @@ This script tests the basic functionality of the NCBI Data Retriever
 without actually downloading from NCBI (to avoid API calls during testing).
 """
 
+import io
+import json
 import os
 import sys
 import tempfile
+import zipfile
 from pathlib import Path
 
 # Add the current directory to the path so we can import our module
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from ncbi_data_retriever import NCBIDataRetriever
+# The BLAST runner lives next door in ncbi_blast
+BLAST_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ncbi_blast")
+SAMPLE_BLAST_XML = os.path.join(BLAST_DIR, "sample_blast_output.xml")
+
+from ncbi_data_retriever import NCBIDataRetriever, Config
 
 
 def test_file_reading():
@@ -38,6 +45,30 @@ def test_file_reading():
         print(f"  Sample IDs: {accession_ids[:3]}")
     except Exception as e:
         print(f"✗ CSV file test failed: {e}")
+    
+    # Test with a Word document, including a soft line break (Shift+Enter)
+    # and a table cell
+    try:
+        document_xml = (
+            '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>'
+            '<w:p><w:r><w:t>NM_000546</w:t><w:br/><w:t>NM_000547</w:t></w:r></w:p>'
+            '<w:p><w:r><w:t># comment</w:t></w:r></w:p>'
+            '<w:tbl><w:tr><w:tc><w:p><w:r><w:t>NM_</w:t></w:r><w:r><w:t>000548</w:t></w:r></w:p></w:tc></w:tr></w:tbl>'
+            '</w:body></w:document>'
+        )
+        with tempfile.TemporaryDirectory() as temp_dir:
+            docx_path = Path(temp_dir) / "accession_list.docx"
+            with zipfile.ZipFile(docx_path, 'w') as docx:
+                docx.writestr('word/document.xml', document_xml)
+            accession_ids = retriever._read_accession_ids(docx_path)
+        
+        expected = ['NM_000546', 'NM_000547', 'NM_000548']
+        if accession_ids == expected:
+            print(f"✓ Word document: Found {len(accession_ids)} accession IDs")
+        else:
+            print(f"✗ Word document test failed: expected {expected}, got {accession_ids}")
+    except Exception as e:
+        print(f"✗ Word document test failed: {e}")
 
 
 def test_config_loading():
@@ -48,9 +79,9 @@ def test_config_loading():
         retriever = NCBIDataRetriever.__new__(NCBIDataRetriever)
         config = retriever._load_config("sample_config.yaml")
         print("✓ Configuration loaded successfully")
-        print(f"  Email: {config['email']}")
-        print(f"  Input file: {config['input_file_path']}")
-        print(f"  Output path: {config['output_path']}")
+        print(f"  Email: {config.email}")
+        print(f"  Input file: {config.input_file_path}")
+        print(f"  Output path: {config.output_path}")
     except Exception as e:
         print(f"✗ Configuration test failed: {e}")
 
@@ -81,6 +112,167 @@ def test_accession_cleaning():
         print(f"✗ Accession cleaning test failed: {e}")
 
 
+def test_record_splitting():
+    """Test splitting a streamed efetch response into per-accession records."""
+    print("\nTesting record splitting...")
+    
+    genbank = (
+        "LOCUS       NM_000546               2512 bp    mRNA    linear   PRI 01-JAN-2024\n"
+        "ACCESSION   NM_000546\n"
+        "VERSION     NM_000546.6\n"
+        "ORIGIN\n"
+        "        1 gatgggattg gggttttccc ctcccatgtg\n"
+        "//\n"
+        "LOCUS       NR_003051                960 bp    RNA     linear   PRI 01-JAN-2024\n"
+        "ACCESSION   NR_003051\n"
+        "VERSION     NR_003051.3\n"
+        "ORIGIN\n"
+        "        1 ccgcagtcag atcctagcgt\n"
+        "//\n"
+    )
+    fasta = (
+        ">NM_000546.6 Homo sapiens tumor protein p53 (TP53), mRNA\n"
+        "GATGGGATTGGGGTTTTCCCCTCCCATGTG\n"
+        "\n"
+        ">NR_003051.3 Homo sapiens RNA, 5.8S ribosomal \u0394 variant\n"
+        "CCGCAGTCAGATCCTAGCGT\n"
+    )
+    expected = {
+        'gb': [({'NM_000546', 'NM_000546.6'}, genbank[:genbank.index("LOCUS", 1)]),
+               ({'NR_003051', 'NR_003051.3'}, genbank[genbank.index("LOCUS", 1):])],
+        'fasta': [({'NM_000546', 'NM_000546.6'}, fasta[:fasta.index(">", 1)]),
+                  ({'NR_003051', 'NR_003051.3'}, fasta[fasta.index(">", 1):])],
+    }
+    
+    try:
+        retriever = NCBIDataRetriever.__new__(NCBIDataRetriever)
+        for rettype, text in (('gb', genbank), ('fasta', fasta)):
+            data = text.encode('utf-8')
+            # Small chunks split lines (and the multi-byte character) across chunks
+            for chunk_size in (1, 7, 64 * 1024):
+                chunks = [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)]
+                records = list(retriever._iter_records(retriever._iter_lines(chunks), rettype))
+                if records != expected[rettype]:
+                    print(f"✗ Record splitting test failed for {rettype} with {chunk_size}-byte chunks: {records}")
+                    break
+            else:
+                print(f"✓ Split {len(expected[rettype])} {rettype} records from a streamed response")
+    except Exception as e:
+        print(f"✗ Record splitting test failed: {e}")
+
+
+class FakeResponse:
+    """A stand-in for a streamed requests response with a fixed body."""
+    
+    def __init__(self, body):
+        self.body = body
+    
+    def iter_content(self, chunk_size=1):
+        for i in range(0, len(self.body), chunk_size):
+            yield self.body[i:i + chunk_size]
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        return False
+
+
+def test_partly_cached_batch():
+    """Test that cached records are kept when NCBI sends an error for the rest of the batch."""
+    print("\nTesting a batch where NCBI returns an error for the uncached IDs...")
+    
+    try:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            retriever = NCBIDataRetriever.__new__(NCBIDataRetriever)
+            retriever.config = Config(email="test@example.com", input_file_path="unused.txt")
+            retriever.output_dir = Path(temp_dir)
+            retriever.cache_dir = Path(temp_dir) / ".cache"
+            retriever.cache_dir.mkdir()
+            
+            cached_record = ">XM_1.2 cached sequence\nACGT\n"
+            retriever._write_cached_record("XM_1.2", "fasta", cached_record)
+            for body in (b"", b"Error: F a i l u r e\n"):
+                retriever._ncbi_post = lambda url, params, stream=False, body=body: FakeResponse(body)
+                result = retriever._download_batch(1, 1, ["XM_1.2", "NM_999999"], "fasta")
+                if result is None:
+                    print(f"✗ Batch with a cached record was dropped for response {body!r}")
+                    continue
+                batch_filepath, found_ids = result
+                if found_ids == ["XM_1.2"] and Path(batch_filepath).read_text() == cached_record:
+                    print(f"✓ Cached record kept for response {body!r}")
+                else:
+                    print(f"✗ Unexpected batch result for response {body!r}: {found_ids}")
+    except Exception as e:
+        print(f"✗ Partly cached batch test failed: {e}")
+
+
+def _blast_reference_json(xml_path, **json_options):
+    """Build the JSON the original runner wrote, by parsing BLAST XML with NCBIXML."""
+    from Bio.Blast import NCBIXML
+    
+    hsp_keys = ["align_length", "bits", "expect", "frame", "gaps", "identities", "positives", "query",
+                "query_end", "query_start", "sbjct", "sbjct_end", "sbjct_start", "score", "strand"]
+    results_list = []
+    with open(xml_path, "rb") as handle:
+        for blast_record in NCBIXML.parse(handle):
+            results_list.append({
+                "query": blast_record.query,
+                "query_id": blast_record.query_id,
+                "alignments": [{
+                    "title": alignment.title,
+                    "hit_id": alignment.hit_id,
+                    "hit_def": alignment.hit_def,
+                    "length": alignment.length,
+                    "hsps": [{key: getattr(hsp, key) for key in hsp_keys} for hsp in alignment.hsps]
+                } for alignment in blast_record.alignments]
+            })
+    return json.dumps(results_list, **json_options)
+
+
+def test_blast_json_parity():
+    """Test that the BLAST runner's JSON matches what NCBIXML + json.dump produce."""
+    print("\nTesting BLAST XML to JSON conversion...")
+    
+    try:
+        sys.path.insert(0, BLAST_DIR)
+        import bio357_blast_runner
+    except ImportError as e:
+        print(f"- Skipped BLAST test ({e}); install biopython to run it")
+        return
+    
+    try:
+        # Indented output is written with json and must match it exactly. Compact
+        # output may come from orjson, which formats some floats differently
+        # (2e-7 instead of 2e-07), so it only has to decode to the same data.
+        layouts = [
+            ("indented", False, {"indent": 4}, True),
+            ("compact", True, {"separators": (",", ":")}, False),
+        ]
+        for name, compact, json_options, exact in layouts:
+            expected = _blast_reference_json(SAMPLE_BLAST_XML, **json_options)
+            output = io.StringIO()
+            with open(SAMPLE_BLAST_XML, "rb") as handle:
+                bio357_blast_runner._transcode_blast_xml(handle, output, compact)
+            if exact:
+                matches = output.getvalue() == expected
+            else:
+                matches = json.loads(output.getvalue()) == json.loads(expected)
+            if matches:
+                print(f"✓ {name.capitalize()} BLAST JSON matches NCBIXML output")
+            else:
+                print(f"✗ {name.capitalize()} BLAST JSON differs from NCBIXML output")
+        
+        # An error page is not BLAST XML and must not turn into an empty result
+        try:
+            bio357_blast_runner._transcode_blast_xml(io.BytesIO(b"<html><body>Error</body></html>"), io.StringIO())
+            print("✗ An HTML error page was accepted as BLAST XML")
+        except ValueError:
+            print("✓ An HTML error page is rejected")
+    except Exception as e:
+        print(f"✗ BLAST JSON test failed: {e}")
+
+
 def main():
     """Run all tests."""
     print("=" * 60)
@@ -103,6 +295,9 @@ def main():
     test_config_loading()
     test_file_reading()
     test_accession_cleaning()
+    test_record_splitting()
+    test_partly_cached_batch()
+    test_blast_json_parity()
     
     print("\n" + "=" * 60)
     print("Test suite completed!")
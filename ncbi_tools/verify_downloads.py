@@ -8,6 +8,22 @@ import glob
 from pathlib import Path
 
 
+def _sniff(path, size=16):
+    """
+    Return the first few bytes of a file, which is enough to recognize its format.
+    
+    Uses os.pread where available (Linux/macOS) and a plain binary read on Windows.
+    """
+    if not hasattr(os, 'pread'):
+        with open(path, 'rb') as f:
+            return f.read(size)
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        return os.pread(fd, size, 0)
+    finally:
+        os.close(fd)
+
+
 def verify_downloads():
     """Check if both GenBank and FASTA files were downloaded."""
     print("=" * 60)
@@ -52,16 +68,15 @@ def verify_downloads():
     
     for file in genbank_files + fasta_files:
         try:
-            with open(file, 'r') as f:
-                content = f.read(500)  # Read first 500 characters
+            head = _sniff(file).lstrip()  # First bytes, ignoring leading blank lines
                 
             if file.suffix == '.genbank':
-                if 'LOCUS' in content:
+                if head.startswith(b'LOCUS'):
                     print(f"   ✅ {file.name} appears to be valid GenBank format")
                 else:
                     print(f"   ⚠️  {file.name} may not be valid GenBank format")
             elif file.suffix == '.fasta':
-                if content.startswith('>'):
+                if head.startswith(b'>'):
                     print(f"   ✅ {file.name} appears to be valid FASTA format")
                 else:
                     print(f"   ⚠️  {file.name} may not be valid FASTA format")